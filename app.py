@@ -1,14 +1,36 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, flash, session, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import event, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from dotenv import load_dotenv
+from celery import Celery
 import os
+import sqlite3
 import google.generativeai as genai
 import asyncio
+import concurrent.futures
+import datetime
+import hashlib
+import queue
+import threading
 import time
-import json
+import orjson
 import re
+import zstandard
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +38,12 @@ load_dotenv()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 
+# Render terminates requests at a proxy; take the client address from its X-Forwarded-For
+# so rate limits apply per client. Set PROXY_COUNT=0 when nothing sits in front of the app.
+proxy_count = int(os.environ.get('PROXY_COUNT', 1))
+if proxy_count:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_count)
+
 # Configure database with support for Render/production and local development
 # Prefer DATABASE_URL if provided (e.g., from a managed Postgres). Otherwise, use SQLite in the instance folder.
 os.makedirs(app.instance_path, exist_ok=True)
@@ -31,47 +59,756 @@ else:
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Wait for review inserts to reach disk before responding (for deployments that must not lose a committed review)
+app.config['DURABLE_REVIEW_COMMITS'] = os.environ.get('DURABLE_REVIEW_COMMITS') == '1'
+
+# Connection pool per worker process: size it so pool_size + max_overflow covers the worker's threads.
+# pool_pre_ping/pool_recycle replace connections that managed Postgres closed while idle.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+    'pool_pre_ping': True,
+    'pool_recycle': 1800
+}
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a review is being written; NORMAL only syncs at checkpoints
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA cache_size=-64000')
+        cursor.close()
+
 # Initialize extensions
 db = SQLAlchemy(app)
+# Batch mode lets Alembic alter columns on SQLite by recreating the table
+migrate = Migrate(app, db, render_as_batch=True)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# Background analysis queue; when CELERY_BROKER_URL is set, analyses run on Celery workers
+# (`celery -A app.celery_app worker`) and the web request returns immediately
+celery_broker_url = os.environ.get('CELERY_BROKER_URL')
+celery_app = Celery('gcr', broker=celery_broker_url)
+celery_app.conf.task_ignore_result = True
+redis_url = os.environ.get('REDIS_URL')
+
+# Rate limits are counted in Redis when available so they hold across workers. If Redis goes
+# down, each worker counts in memory until it is back, rather than failing every limited request.
+limiter = Limiter(
+    get_remote_address,
+    app=app,
+    storage_uri=redis_url or 'memory://',
+    in_memory_fallback_enabled=True
+)
+
 # Configure Gemini AI
 genai.configure(api_key=os.environ.get('GOOGLE_API_KEY'))
 
-# Initialize Gemini model with optimized settings
-model = genai.GenerativeModel(
+# One Gemini model per task, built once with its generation settings baked in
+analysis_generation_config = genai.types.GenerationConfig(
+    temperature=0.1,
+    max_output_tokens=800,
+    top_p=0.8,
+    top_k=20
+)
+analyze_model = genai.GenerativeModel('gemini-pro', generation_config=analysis_generation_config)
+
+# Larger output budget for prompts that carry several snippets at once
+batch_analyze_model = genai.GenerativeModel(
     'gemini-pro',
     generation_config=genai.types.GenerationConfig(
         temperature=0.1,
-        max_output_tokens=800,
+        max_output_tokens=800 * 4,
         top_p=0.8,
         top_k=20
     )
 )
 
+# Quick debugging only asks for a short JSON answer, so cap it lower and keep it deterministic
+debug_model = genai.GenerativeModel(
+    'gemini-pro',
+    generation_config=genai.types.GenerationConfig(
+        temperature=0.0,
+        max_output_tokens=300
+    )
+)
+
+# Budget for submitted code, in model tokens (Gemini bills and rate-limits on tokens, not characters)
+ANALYZE_MAX_CODE_TOKENS = 640
+DEBUG_MAX_CODE_TOKENS = 480
+
+# Total time spent counting tokens for one snippet, across the first count and the recount
+COUNT_TOKENS_TIMEOUT = 5
+
+def truncate_code(code, max_tokens, marker):
+    # A token usually covers at least one character, so shorter input is taken as within budget.
+    # Rare Unicode can break into several byte-fallback tokens per character, so this isn't guaranteed.
+    if len(code) <= max_tokens:
+        return code
+    deadline = time.monotonic() + COUNT_TOKENS_TIMEOUT
+    try:
+        total_tokens = analyze_model.count_tokens(code, request_options={'timeout': COUNT_TOKENS_TIMEOUT}).total_tokens
+    except Exception:
+        # Tokenizer unreachable: assume roughly three characters per token
+        if len(code) <= max_tokens * 3:
+            return code
+        return code[:max_tokens * 3] + marker
+    if total_tokens <= max_tokens:
+        return code
+    # Token density isn't uniform, so cut proportionally with 10% headroom and re-count once
+    code = code[:len(code) * max_tokens * 9 // (total_tokens * 10)]
+    remaining = deadline - time.monotonic()
+    if remaining > 0:
+        try:
+            if analyze_model.count_tokens(code, request_options={'timeout': remaining}).total_tokens <= max_tokens:
+                return code + marker
+        except Exception:
+            pass
+    # Still over budget or out of time: keep one character per token (see the caveat above)
+    return code[:max_tokens] + marker
+
+def truncate_for_analysis(code):
+    return truncate_code(code, ANALYZE_MAX_CODE_TOKENS, "... [truncated for faster analysis]")
+
+# JSON structure requested from Gemini for a comprehensive analysis
+ANALYSIS_SCHEMA = """{
+    "error_detection": {
+        "has_errors": true/false,
+        "error_summary": "Brief description of main errors found",
+        "detailed_errors": [
+            {
+                "error_type": "syntax/logic/runtime/semantic",
+                "line_number": "Specific line number (e.g., 5)",
+                "line_content": "Exact content of the problematic line",
+                "column_position": "Character position in line if applicable",
+                "error_description": "What exactly is wrong",
+                "actual_error": "The specific error message or problem",
+                "error_severity": "critical/high/medium/low",
+                "why_it_happens": "Explanation of why this error occurs",
+                "how_to_fix": "Step-by-step solution",
+                "corrected_line": "Fixed version of the specific line",
+                "corrected_code_snippet": "Fixed version of surrounding code context"
+            }
+        ],
+        "error_categories": {
+            "syntax_errors": ["Specific syntax problems with line numbers"],
+            "logic_errors": ["Logical issues that cause wrong behavior"],
+            "runtime_errors": ["Issues that would cause crashes"],
+            "semantic_errors": ["Code that compiles but doesn't do what intended"]
+        }
+    },
+    "debug_analysis": {
+        "overall_code_health": "healthy/has_issues/critical_issues",
+        "debugging_priority": ["Most critical issues to fix first"],
+        "fixed_code": "Complete corrected version of the code",
+        "explanation_of_fixes": "Detailed explanation of all changes made",
+        "testing_suggestions": ["How to test the fixed code"]
+    },
+    "code_review": {
+        "overall_rating": 8,
+        "code_quality": {
+            "rating": 7,
+            "assessment": "Assessment after considering errors"
+        },
+        "readability": {
+            "rating": 8,
+            "assessment": "Readability assessment with specific rating"
+        },
+        "maintainability": {
+            "rating": 7,
+            "assessment": "Maintainability assessment with specific rating"
+        },
+        "line_by_line_analysis": [
+            {
+                "line_number": "Line number",
+                "line_content": "Actual line content",
+                "quality_score": "1-10 rating for this line",
+                "issues": ["Specific issues with this line"],
+                "suggestions": ["Improvements for this line"],
+                "complexity_note": "Complexity impact of this line"
+            }
+        ]
+    },
+    "security_analysis": {
+        "vulnerabilities": ["Security issues found"],
+        "recommendations": ["Security improvements"]
+    },
+    "performance_analysis": {
+        "bottlenecks": ["Performance issues with line numbers"],
+        "optimizations": ["Performance improvements with specific suggestions"],
+        "time_complexity": {
+            "overall": "O(n), O(n²), etc.",
+            "breakdown": [
+                {
+                    "function_name": "function name",
+                    "lines": "line range (e.g., 5-10)",
+                    "complexity": "O(n)",
+                    "explanation": "Why this complexity"
+                }
+            ]
+        },
+        "space_complexity": {
+            "overall": "O(1), O(n), etc.",
+            "breakdown": [
+                {
+                    "component": "data structure or variable",
+                    "lines": "line range",
+                    "complexity": "O(n)",
+                    "explanation": "Memory usage explanation"
+                }
+            ]
+        },
+        "complexity_analysis": {
+            "best_case": "Best case scenario complexity",
+            "average_case": "Average case complexity",
+            "worst_case": "Worst case complexity",
+            "scalability_notes": "How code scales with input size"
+        }
+    },
+    "improvement_suggestions": {
+        "best_practices": ["Best practice recommendations"],
+        "refactoring": ["Refactoring suggestions"],
+        "modern_features": ["Modern language features to use"]
+    },
+    "summary": {
+        "error_status": "error-free/has-errors/critical-errors",
+        "main_issues": ["Top 3 most important issues"],
+        "strengths": ["Code strengths"],
+        "priority_fixes": ["Most important fixes in order"],
+        "overall_score": 8
+    }
+}"""
+
+# Prompt templates are assembled once at import; requests only fill in the %-placeholders
+ANALYSIS_PROMPT_TEMPLATE = """Perform comprehensive analysis of this %(language)s code with detailed error detection:
+
+```%(language)s
+%(code)s
+```
+
+Error context: %(error)s
+
+IMPORTANT: Focus heavily on debugging and error detection first. Provide detailed JSON analysis:
+
+""" + ANALYSIS_SCHEMA.replace('%', '%%')
+
+BATCHED_ANALYSIS_PROMPT_TEMPLATE = """Perform comprehensive analysis of each of these %(count)d code snippets with detailed error detection:
+
+%(snippets)s
+
+IMPORTANT: Focus heavily on debugging and error detection first. Return a JSON array with exactly %(count)d objects, one per snippet in the order given, each following this structure:
+
+""" + ANALYSIS_SCHEMA.replace('%', '%%')
+
+SNIPPET_TEMPLATE = """### Snippet %(index)d (%(language)s):
+```%(language)s
+%(code)s
+```
+Error context: %(error)s"""
+
+DEBUG_PROMPT_TEMPLATE = """Quick debug for %(language)s:
+
+```%(language)s
+%(code)s
+```
+
+Error: %(error)s
+
+JSON (be brief):
+{
+    "issue_explanation": "Brief issue description",
+    "fixed_code": "Key fixes only",
+    "fix_explanation": "Short explanation",
+    "prevention_tips": ["Top 2 tips"]
+}"""
+
+# Returned when Gemini fails or times out
+FALLBACK_ANALYSIS_TEMPLATE = '''{
+    "error_detection": {
+        "has_errors": false,
+        "error_summary": "Unable to perform detailed error analysis due to timeout",
+        "detailed_errors": [],
+        "error_categories": {
+            "syntax_errors": ["Manual syntax check recommended"],
+            "logic_errors": ["Manual logic review needed"],
+            "runtime_errors": ["Test code execution thoroughly"],
+            "semantic_errors": ["Verify code behavior matches intent"]
+        }
+    },
+    "debug_analysis": {
+        "overall_code_health": "unknown",
+        "debugging_priority": ["Manual debugging recommended"],
+        "fixed_code": "Original code - manual debugging required",
+        "explanation_of_fixes": "AI analysis timed out - manual review needed",
+        "testing_suggestions": ["Test all code paths", "Use debugger tools", "Add logging statements"]
+    },
+    "code_review": {
+        "overall_rating": 6,
+        "code_quality": {
+            "rating": 6,
+            "assessment": "Basic %(language)s structure appears functional"
+        },
+        "readability": {
+            "rating": 6,
+            "assessment": "Code structure seems readable"
+        },
+        "maintainability": {
+            "rating": 6,
+            "assessment": "Standard maintainability practices recommended"
+        }
+    },
+    "security_analysis": {
+        "vulnerabilities": ["Manual security review recommended"],
+        "recommendations": ["Follow security best practices", "Validate all inputs"]
+    },
+    "performance_analysis": {
+        "bottlenecks": ["Profile code for performance issues"],
+        "optimizations": ["Consider algorithmic improvements"],
+        "time_complexity": {
+            "overall": "Analysis not available",
+            "breakdown": []
+        },
+        "space_complexity": {
+            "overall": "Analysis not available", 
+            "breakdown": []
+        },
+        "complexity_analysis": {
+            "best_case": "Manual analysis required",
+            "average_case": "Manual analysis required",
+            "worst_case": "Manual analysis required",
+            "scalability_notes": "Test with different input sizes"
+        }
+    },
+    "improvement_suggestions": {
+        "best_practices": ["Follow %(language)s coding standards", "Add proper error handling"],
+        "refactoring": ["Consider code organization improvements"],
+        "modern_features": ["Use modern %(language)s features where appropriate"]
+    },
+    "summary": {
+        "error_status": "unknown",
+        "main_issues": ["Analysis timeout - manual review needed"],
+        "strengths": ["Code structure exists"],
+        "priority_fixes": ["Manual code review recommended"],
+        "overall_score": 6
+    }
+}'''
+
+DEBUG_FALLBACK = '''{
+    "issue_explanation": "Unable to analyze due to timeout",
+    "fixed_code": "Manual debugging required",
+    "fix_explanation": "Please check syntax and logic manually",
+    "prevention_tips": ["Use IDE debugging tools", "Add print statements for debugging"]
+}'''
+
+def build_analysis_prompt(code, language, error_message):
+    return ANALYSIS_PROMPT_TEMPLATE % {
+        'language': language,
+        'code': code,
+        'error': error_message or 'No specific error reported'
+    }
+
+def build_batched_analysis_prompt(snippets):
+    sections = '\n\n'.join(
+        SNIPPET_TEMPLATE % {
+            'index': index,
+            'language': language,
+            'code': code,
+            'error': error_message or 'No specific error reported'
+        }
+        for index, (code, language, error_message) in enumerate(snippets, 1)
+    )
+    return BATCHED_ANALYSIS_PROMPT_TEMPLATE % {'count': len(snippets), 'snippets': sections}
+
+# Batch concurrent Gemini calls onto a single background event loop
+class AnalysisBatcher:
+    """Coalesce prompts submitted by concurrent requests and send them together.
+
+    Worker threads hand their prompt to a background asyncio loop and block on a
+    future. The loop collects up to ``max_batch`` prompts (or waits ``max_wait``
+    seconds) and dispatches them with ``asyncio.gather`` so they share the same
+    connection instead of each request paying for its own round trip.
+    """
+
+    def __init__(self, max_batch=16, max_wait=0.02):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._loop = None
+        self._queue = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily so each Gunicorn worker owns its loop after forking
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='analysis-batcher', daemon=True).start()
+            self._queue = asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+            self._loop = loop
+
+    async def _start(self):
+        prompts = asyncio.Queue()
+        asyncio.get_running_loop().create_task(self._dispatch(prompts))
+        return prompts
+
+    async def _dispatch(self, prompts):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await prompts.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(prompts.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Don't block collection of the next batch on this one finishing
+            loop.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        await asyncio.gather(*(self._generate(*item) for item in batch))
+
+    async def _generate(self, gen_model, prompt, timeout, future):
+        try:
+            response = await gen_model.generate_content_async(
+                prompt,
+                request_options={'timeout': timeout}
+            )
+            future.set_result(response.text)
+        except Exception as e:
+            future.set_exception(e)
+
+    async def _stream(self, gen_model, prompt, timeout, chunks):
+        try:
+            response = await gen_model.generate_content_async(
+                prompt,
+                stream=True,
+                request_options={'timeout': timeout}
+            )
+            async for chunk in response:
+                text = chunk.text if chunk.parts else ''
+                if text:
+                    chunks.put(('chunk', text))
+        except Exception as e:
+            chunks.put(('error', e))
+            return
+        chunks.put(('done', None))
+
+    def stream(self, gen_model, prompt, timeout):
+        """Generate on the loop without batching and yield the response text as chunks arrive."""
+        self._ensure_started()
+        chunks = queue.Queue()
+        asyncio.run_coroutine_threadsafe(self._stream(gen_model, prompt, timeout, chunks), self._loop)
+        while True:
+            kind, value = chunks.get(timeout=timeout + 5)
+            if kind == 'error':
+                raise value
+            if kind == 'done':
+                return
+            yield value
+
+    def schedule(self, gen_model, prompt, timeout):
+        """Queue a prompt and return a ``concurrent.futures.Future`` for its text."""
+        self._ensure_started()
+        future = concurrent.futures.Future()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (gen_model, prompt, timeout, future))
+        return future
+
+    def submit(self, gen_model, prompt, timeout):
+        """Queue a prompt and block until its response text is available."""
+        return self.schedule(gen_model, prompt, timeout).result(timeout=timeout + 5)
+
+batcher = AnalysisBatcher()
+
+def _copy_future(source, target):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+def _strip_code_fence(text):
+    # Gemini frequently wraps JSON answers in ```json ... ``` fences
+    match = re.match(r'^\s*```(?:json)?\s*(.*?)\s*```\s*$', text or '', re.DOTALL)
+    return match.group(1) if match else text
+
+class BatchedAnalyzer:
+    """Marshal small concurrent analyses into a single multi-snippet prompt.
+
+    A snippet is sent on its own straight away unless another analysis for the
+    same user is already in flight. Only then is it held, for up to ``max_wait``
+    seconds or until ``max_snippets`` have gathered, so a burst shares one prompt
+    and the large ``ANALYSIS_SCHEMA`` scaffold is sent once per group. Snippets of
+    different users are never combined, since every analysis is generated from
+    the whole prompt. Gemini returns a JSON array which is fanned back out to each
+    waiting request; if it can't be matched up, every snippet is retried on its own.
+    """
+
+    def __init__(self, max_snippets=4, max_wait=0.05):
+        self.max_snippets = max_snippets
+        self.max_wait = max_wait
+        self._pending = {}
+        self._timers = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, code, language, error_message, timeout=15):
+        """Send or queue a snippet and block until its analysis text is available."""
+        future = concurrent.futures.Future()
+        item = ((code, language, error_message), future, timeout)
+        batch = None
+        with self._lock:
+            if user_id in self._in_flight or user_id in self._pending:
+                pending = self._pending.setdefault(user_id, [])
+                pending.append(item)
+                if len(pending) >= self.max_snippets:
+                    batch = self._take(user_id)
+                elif user_id not in self._timers:
+                    timer = threading.Timer(self.max_wait, self._flush, args=(user_id,))
+                    timer.daemon = True
+                    self._timers[user_id] = timer
+                    timer.start()
+            else:
+                batch = [item]
+            if batch:
+                self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+        if batch:
+            self._send(user_id, batch)
+        # A grouped prompt may need a single-snippet retry, so allow for both
+        return future.result(timeout=timeout * 3 + 5)
+
+    def _take(self, user_id):
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+        return self._pending.pop(user_id, [])
+
+    def _flush(self, user_id):
+        with self._lock:
+            batch = self._take(user_id)
+            if batch:
+                self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+        if batch:
+            self._send(user_id, batch)
+
+    def _landed(self, user_id):
+        with self._lock:
+            self._in_flight[user_id] -= 1
+            if not self._in_flight[user_id]:
+                del self._in_flight[user_id]
+
+    def _send(self, user_id, batch):
+        if len(batch) == 1:
+            source = self._send_single(batch[0])
+        else:
+            prompt = build_batched_analysis_prompt([snippet for snippet, _, _ in batch])
+            timeout = max(item_timeout for _, _, item_timeout in batch) * 2
+            source = batcher.schedule(batch_analyze_model, prompt, timeout)
+            source.add_done_callback(lambda done: self._fan_out(batch, done))
+        source.add_done_callback(lambda done: self._landed(user_id))
+
+    def _send_single(self, item):
+        snippet, future, timeout = item
+        source = batcher.schedule(analyze_model, build_analysis_prompt(*snippet), timeout)
+        source.add_done_callback(lambda done: _copy_future(done, future))
+        return source
+
+    def _fan_out(self, batch, source):
+        if source.exception() is not None:
+            for _, future, _ in batch:
+                future.set_exception(source.exception())
+            return
+        try:
+            analyses = orjson.loads(_strip_code_fence(source.result()))
+            if not isinstance(analyses, list) or len(analyses) != len(batch):
+                raise ValueError("Batched response does not match snippet count")
+        except Exception:
+            for item in batch:
+                self._send_single(item)
+            return
+        for (_, future, _), analysis in zip(batch, analyses):
+            future.set_result(orjson.dumps(analysis, option=orjson.OPT_INDENT_2).decode())
+
+analyzer = BatchedAnalyzer()
+
+# Argon2id for new passwords; accounts hashed by Werkzeug are upgraded on their next login
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19 * 1024, parallelism=1)
+DUMMY_PASSWORD_HASH = password_hasher.hash('dummy-password')
+
+def check_dummy_password(password):
+    # Same hashing cost as a real check, so response time doesn't reveal whether a username exists
+    try:
+        password_hasher.verify(DUMMY_PASSWORD_HASH, password)
+    except (VerificationError, InvalidHashError):
+        pass
+
 # User Model
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    username = db.Column(db.String(80), unique=True, index=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, index=True, nullable=False)
     password_hash = db.Column(db.String(120), nullable=False)
     reviews = db.relationship('CodeReview', backref='author', lazy=True)
 
+    def check_password(self, password):
+        if not self.password_hash.startswith('$argon2'):
+            # Legacy Werkzeug pbkdf2/scrypt hash
+            if not check_password_hash(self.password_hash, password):
+                return False
+            self.password_hash = password_hasher.hash(password)
+            db.session.commit()
+            return True
+        try:
+            password_hasher.verify(self.password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+        if password_hasher.check_needs_rehash(self.password_hash):
+            self.password_hash = password_hasher.hash(password)
+            db.session.commit()
+        return True
+
+# Text column stored as a compressed blob with a one-byte format prefix
+class CompressedText(db.TypeDecorator):
+    impl = db.LargeBinary
+    cache_ok = True
+
+    RAW = b'\x00'
+    ZSTD = b'\x01'
+    # Below this size the zstd frame overhead outweighs the savings
+    MIN_COMPRESS_SIZE = 256
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        data = value.encode('utf-8')
+        if len(data) < self.MIN_COMPRESS_SIZE:
+            return self.RAW + data
+        return self.ZSTD + zstandard.compress(data, 3)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            # Row written while the column was still TEXT (SQLite keeps the original storage class)
+            return value
+        value = bytes(value)
+        prefix, body = value[:1], value[1:]
+        if prefix == self.ZSTD:
+            return zstandard.decompress(body).decode('utf-8')
+        if prefix == self.RAW:
+            return body.decode('utf-8')
+        # Legacy text converted to bytes by the migration
+        return value.decode('utf-8')
+
 # Code Review Model
 class CodeReview(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    code = db.Column(db.Text, nullable=False)
+    code = db.Column(CompressedText, nullable=False)
     language = db.Column(db.String(50), nullable=False)
-    review_result = db.Column(db.Text)
+    review_result = db.Column(CompressedText)
+    status = db.Column(db.String(20), nullable=False, default='done')  # pending/done/failed
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
-# Ensure tables exist when running under a WSGI server (e.g., Gunicorn on Render)
-with app.app_context():
-    db.create_all()
+    # Serves the per-user "most recent first" queries on the dashboard and history pages
+    __table_args__ = (
+        db.Index('ix_review_user_created', 'user_id', db.desc('created_at')),
+    )
+
+def commit_review_writes():
+    # Reviews and cached analyses can be regenerated, so on Postgres don't wait for the WAL flush
+    # unless DURABLE_REVIEW_COMMITS is set; SQLite already syncs only at WAL checkpoints
+    if not app.config['DURABLE_REVIEW_COMMITS'] and db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text('SET LOCAL synchronous_commit TO OFF'))
+    db.session.commit()
+
+# Cache of successful analyses, keyed by a hash of the analysed input
+class CodeAnalysisCache(db.Model):
+    hash = db.Column(db.String(64), primary_key=True)
+    language = db.Column(db.String(50), nullable=False)
+    result = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+def analysis_cache_key(code, language, error_message):
+    # The error context is part of the prompt, so it is part of the key as well
+    return hashlib.sha256(f"{language}\x00{error_message}\x00{code}".encode()).hexdigest()
+
+def add_cached_analysis(cache_key, language, result):
+    # Only well-formed answers are cached: output cut off at max_output_tokens or otherwise not JSON
+    # would be served for this input forever. The row joins the caller's transaction, and a row another
+    # request cached first is kept.
+    try:
+        orjson.loads(_strip_code_fence(result))
+    except (ValueError, TypeError):
+        return
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        db.session.execute(
+            insert(CodeAnalysisCache)
+            .values(hash=cache_key, language=language, result=result)
+            .on_conflict_do_nothing(index_elements=['hash'])
+        )
+        return
+    # Other databases: insert in a savepoint, so a duplicate only undoes the cache row and not the review
+    try:
+        with db.session.begin_nested():
+            db.session.add(CodeAnalysisCache(hash=cache_key, language=language, result=result))
+    except IntegrityError:
+        pass
+
+# Schema is managed by Alembic (`flask db upgrade`); FLASK_INIT_DB=1 creates tables directly for throwaway setups
+if os.environ.get('FLASK_INIT_DB') == '1':
+    with app.app_context():
+        empty_database = not db.inspect(db.engine).get_table_names()
+        db.create_all()
+        if empty_database:
+            # Mark the new schema as head so a later `flask db upgrade` doesn't try to build it again.
+            # Stamped through the migration context rather than Flask-Migrate, whose env.py
+            # reconfigures logging and would do so in every worker importing this module.
+            migrations = ScriptDirectory(os.path.join(app.root_path, 'migrations'))
+            with db.engine.begin() as connection:
+                MigrationContext.configure(connection).stamp(migrations, 'head')
+
+# Pending reviews older than this were lost with the worker running them (restart, crash, timeout)
+PENDING_REVIEW_TIMEOUT = datetime.timedelta(minutes=10)
+
+def fail_review(review):
+    review.review_result = FALLBACK_ANALYSIS_TEMPLATE % {'language': review.language}
+    review.status = 'failed'
+    commit_review_writes()
+
+def expire_stale_review(review):
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    if review.status == 'pending' and review.created_at < now - PENDING_REVIEW_TIMEOUT:
+        fail_review(review)
+
+# Run a queued analysis on a Celery worker and write it back to the pending review
+@celery_app.task
+def run_analysis(review_id, cache_key, error_message):
+    with app.app_context():
+        review = db.session.get(CodeReview, review_id)
+        if review is None:
+            return
+        try:
+            result = analyzer.submit(
+                review.user_id, truncate_for_analysis(review.code), review.language, error_message, timeout=15
+            )
+            if not result:
+                raise Exception("Empty response from AI")
+        except Exception:
+            fail_review(review)
+            return
+        review.review_result = result
+        review.status = 'done'
+        add_cached_analysis(cache_key, review.language, result)
+        commit_review_writes()
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -81,7 +818,7 @@ def load_user(user_id):
 @app.route('/')
 def index():
     if current_user.is_authenticated:
-        recent_reviews = CodeReview.query.filter_by(user_id=current_user.id).order_by(CodeReview.created_at.desc()).limit(5).all()
+        recent_reviews = CodeReview.query.options(defer(CodeReview.review_result)).filter_by(user_id=current_user.id).order_by(CodeReview.created_at.desc()).limit(5).all()
         return render_template('dashboard.html', reviews=recent_reviews)
     return render_template('index.html')
 
@@ -93,16 +830,19 @@ def register():
         email = data.get('email')
         password = data.get('password')
         
-        if User.query.filter_by(username=username).first():
-            return jsonify({'success': False, 'message': 'Username already exists'})
-        
-        if User.query.filter_by(email=email).first():
+        # Single probe against the unique indexes; only the colliding keys are fetched
+        existing = db.session.query(User.username, User.email).filter(
+            or_(User.username == username, User.email == email)
+        ).first()
+        if existing:
+            if existing.username == username:
+                return jsonify({'success': False, 'message': 'Username already exists'})
             return jsonify({'success': False, 'message': 'Email already registered'})
         
         user = User(
             username=username,
             email=email,
-            password_hash=generate_password_hash(password)
+            password_hash=password_hasher.hash(password)
         )
         db.session.add(user)
         db.session.commit()
@@ -111,16 +851,36 @@ def register():
     
     return render_template('auth.html', mode='register')
 
+def login_username_key():
+    data = request.get_json(silent=True) or {}
+    return f"login:{data.get('username', '')}"
+
+@app.errorhandler(429)
+def rate_limited(e):
+    if request.endpoint == 'login':
+        message = 'Too many login attempts, please try again later'
+    else:
+        message = 'Too many requests, please try again later'
+    return jsonify({'success': False, 'message': message}), 429
+
 @app.route('/login', methods=['GET', 'POST'])
+@limiter.limit("10/minute;100/hour", methods=['POST'])
+@limiter.limit("5/minute", key_func=login_username_key, methods=['POST'])
 def login():
     if request.method == 'POST':
         data = request.get_json()
         username = data.get('username')
         password = data.get('password')
         
+        # Nothing to hash without a password, and it doesn't depend on whether the username exists
+        if not isinstance(password, str) or not password:
+            return jsonify({'success': False, 'message': 'Invalid credentials'})
+        
         user = User.query.filter_by(username=username).first()
         
-        if user and check_password_hash(user.password_hash, password):
+        if user is None:
+            check_dummy_password(password)
+        elif user.check_password(password):
             login_user(user)
             return jsonify({'success': True, 'message': 'Login successful'})
         
@@ -139,6 +899,41 @@ def logout():
 def review_page():
     return render_template('review.html')
 
+def stream_analysis(gen_model, prompt, title, code, language, cache_key, start_time):
+    """Yield Gemini's analysis as NDJSON frames, then store the assembled review."""
+    chunks = []
+    try:
+        for text in batcher.stream(gen_model, prompt, 15):
+            chunks.append(text)
+            yield orjson.dumps({'type': 'chunk', 'text': text}) + b'\n'
+        ai_response = ''.join(chunks)
+        if not ai_response:
+            raise Exception("Empty response from AI")
+        fresh = True
+    except Exception:
+        # Replaces anything streamed so far on the client
+        ai_response = FALLBACK_ANALYSIS_TEMPLATE % {'language': language}
+        fresh = False
+        yield orjson.dumps({'type': 'fallback', 'analysis': ai_response}) + b'\n'
+    
+    review = CodeReview(
+        title=title,
+        code=code,
+        language=language,
+        review_result=ai_response,
+        user_id=current_user.id
+    )
+    db.session.add(review)
+    if fresh:
+        add_cached_analysis(cache_key, language, ai_response)
+    commit_review_writes()
+    
+    yield orjson.dumps({
+        'type': 'done',
+        'review_id': review.id,
+        'processing_time': round(time.time() - start_time, 2)
+    }) + b'\n'
+
 @app.route('/api/analyze-code', methods=['POST'])
 @login_required
 def analyze_code():
@@ -150,212 +945,71 @@ def analyze_code():
         title = data.get('title', 'Code Analysis')
         error_message = data.get('error', '')
         
-        # Limit code length for faster processing
-        if len(code) > 2000:
-            code = code[:2000] + "... [truncated for faster analysis]"
+        # Deferred analysis hands the review to a Celery worker; without a broker there is nothing to defer to
+        if data.get('defer') and not celery_broker_url:
+            return jsonify({'success': False, 'error': 'Deferred analysis is not available on this server'}), 400
         
-        # Create comprehensive analysis prompt with enhanced error detection
-        prompt = f"""Perform comprehensive analysis of this {language} code with detailed error detection:
-
-```{language}
-{code}
-```
-
-Error context: {error_message if error_message else 'No specific error reported'}
-
-IMPORTANT: Focus heavily on debugging and error detection first. Provide detailed JSON analysis:
-
-{{
-    "error_detection": {{
-        "has_errors": true/false,
-        "error_summary": "Brief description of main errors found",
-        "detailed_errors": [
-            {{
-                "error_type": "syntax/logic/runtime/semantic",
-                "line_number": "Specific line number (e.g., 5)",
-                "line_content": "Exact content of the problematic line",
-                "column_position": "Character position in line if applicable",
-                "error_description": "What exactly is wrong",
-                "actual_error": "The specific error message or problem",
-                "error_severity": "critical/high/medium/low",
-                "why_it_happens": "Explanation of why this error occurs",
-                "how_to_fix": "Step-by-step solution",
-                "corrected_line": "Fixed version of the specific line",
-                "corrected_code_snippet": "Fixed version of surrounding code context"
-            }}
-        ],
-        "error_categories": {{
-            "syntax_errors": ["Specific syntax problems with line numbers"],
-            "logic_errors": ["Logical issues that cause wrong behavior"],
-            "runtime_errors": ["Issues that would cause crashes"],
-            "semantic_errors": ["Code that compiles but doesn't do what intended"]
-        }}
-    }},
-    "debug_analysis": {{
-        "overall_code_health": "healthy/has_issues/critical_issues",
-        "debugging_priority": ["Most critical issues to fix first"],
-        "fixed_code": "Complete corrected version of the code",
-        "explanation_of_fixes": "Detailed explanation of all changes made",
-        "testing_suggestions": ["How to test the fixed code"]
-    }},
-    "code_review": {{
-        "overall_rating": 8,
-        "code_quality": {{
-            "rating": 7,
-            "assessment": "Assessment after considering errors"
-        }},
-        "readability": {{
-            "rating": 8,
-            "assessment": "Readability assessment with specific rating"
-        }},
-        "maintainability": {{
-            "rating": 7,
-            "assessment": "Maintainability assessment with specific rating"
-        }},
-        "line_by_line_analysis": [
-            {{
-                "line_number": "Line number",
-                "line_content": "Actual line content",
-                "quality_score": "1-10 rating for this line",
-                "issues": ["Specific issues with this line"],
-                "suggestions": ["Improvements for this line"],
-                "complexity_note": "Complexity impact of this line"
-            }}
-        ]
-    }},
-    "security_analysis": {{
-        "vulnerabilities": ["Security issues found"],
-        "recommendations": ["Security improvements"]
-    }},
-    "performance_analysis": {{
-        "bottlenecks": ["Performance issues with line numbers"],
-        "optimizations": ["Performance improvements with specific suggestions"],
-        "time_complexity": {{
-            "overall": "O(n), O(n²), etc.",
-            "breakdown": [
-                {{
-                    "function_name": "function name",
-                    "lines": "line range (e.g., 5-10)",
-                    "complexity": "O(n)",
-                    "explanation": "Why this complexity"
-                }}
-            ]
-        }},
-        "space_complexity": {{
-            "overall": "O(1), O(n), etc.",
-            "breakdown": [
-                {{
-                    "component": "data structure or variable",
-                    "lines": "line range",
-                    "complexity": "O(n)",
-                    "explanation": "Memory usage explanation"
-                }}
-            ]
-        }},
-        "complexity_analysis": {{
-            "best_case": "Best case scenario complexity",
-            "average_case": "Average case complexity",
-            "worst_case": "Worst case complexity",
-            "scalability_notes": "How code scales with input size"
-        }}
-    }},
-    "improvement_suggestions": {{
-        "best_practices": ["Best practice recommendations"],
-        "refactoring": ["Refactoring suggestions"],
-        "modern_features": ["Modern language features to use"]
-    }},
-    "summary": {{
-        "error_status": "error-free/has-errors/critical-errors",
-        "main_issues": ["Top 3 most important issues"],
-        "strengths": ["Code strengths"],
-        "priority_fixes": ["Most important fixes in order"],
-        "overall_score": 8
-    }}
-}}"""
+        # Identical resubmissions reuse the stored analysis without counting tokens or calling Gemini again
+        cache_key = analysis_cache_key(code, language, error_message)
+        cached = db.session.get(CodeAnalysisCache, cache_key)
         
-        # Get AI analysis with timeout
-        try:
-            response = model.generate_content(
-                prompt,
-                request_options={'timeout': 15}  # 15 second timeout for comprehensive analysis
+        # Queued analysis (every request when a broker is configured, so "defer" is implied):
+        # store a pending review and let a Celery worker fill it in
+        if cached is None and celery_broker_url:
+            review = CodeReview(
+                title=title,
+                code=code,
+                language=language,
+                status='pending',
+                user_id=current_user.id
             )
+            db.session.add(review)
+            commit_review_writes()
+            try:
+                run_analysis.delay(review.id, cache_key, error_message)
+            except Exception:
+                # Broker unreachable: no worker will ever pick this review up
+                fail_review(review)
+                return jsonify({
+                    'success': True,
+                    'analysis': review.review_result,
+                    'review_id': review.id,
+                    'processing_time': round(time.time() - start_time, 2)
+                })
             
-            if not response.text:
-                raise Exception("Empty response from AI")
+            return jsonify({
+                'success': True,
+                'review_id': review.id,
+                'status': review.status
+            })
+        
+        # Streamed analysis: forward Gemini's output as it is generated instead of after the full response
+        if cached is None and data.get('stream'):
+            # Limit code length for faster processing
+            prompt = build_analysis_prompt(truncate_for_analysis(code), language, error_message)
+            return Response(
+                stream_with_context(stream_analysis(analyze_model, prompt, title, code, language, cache_key, start_time)),
+                mimetype='application/x-ndjson'
+            )
+        
+        # Get AI analysis with timeout
+        fresh = False
+        try:
+            if cached is not None:
+                ai_response = cached.result
+            else:
+                # Limit code length for faster processing; 15 second timeout for comprehensive analysis
+                ai_response = analyzer.submit(
+                    current_user.id, truncate_for_analysis(code), language, error_message, timeout=15
+                )
                 
-            ai_response = response.text
+                if not ai_response:
+                    raise Exception("Empty response from AI")
+                fresh = True
             
         except Exception as ai_error:
             # Fallback comprehensive response if AI fails
-            ai_response = f'''{{
-                "error_detection": {{
-                    "has_errors": false,
-                    "error_summary": "Unable to perform detailed error analysis due to timeout",
-                    "detailed_errors": [],
-                    "error_categories": {{
-                        "syntax_errors": ["Manual syntax check recommended"],
-                        "logic_errors": ["Manual logic review needed"],
-                        "runtime_errors": ["Test code execution thoroughly"],
-                        "semantic_errors": ["Verify code behavior matches intent"]
-                    }}
-                }},
-                "debug_analysis": {{
-                    "overall_code_health": "unknown",
-                    "debugging_priority": ["Manual debugging recommended"],
-                    "fixed_code": "Original code - manual debugging required",
-                    "explanation_of_fixes": "AI analysis timed out - manual review needed",
-                    "testing_suggestions": ["Test all code paths", "Use debugger tools", "Add logging statements"]
-                }},
-                "code_review": {{
-                    "overall_rating": 6,
-                    "code_quality": {{
-                        "rating": 6,
-                        "assessment": "Basic {language} structure appears functional"
-                    }},
-                    "readability": {{
-                        "rating": 6,
-                        "assessment": "Code structure seems readable"
-                    }},
-                    "maintainability": {{
-                        "rating": 6,
-                        "assessment": "Standard maintainability practices recommended"
-                    }}
-                }},
-                "security_analysis": {{
-                    "vulnerabilities": ["Manual security review recommended"],
-                    "recommendations": ["Follow security best practices", "Validate all inputs"]
-                }},
-                "performance_analysis": {{
-                    "bottlenecks": ["Profile code for performance issues"],
-                    "optimizations": ["Consider algorithmic improvements"],
-                    "time_complexity": {{
-                        "overall": "Analysis not available",
-                        "breakdown": []
-                    }},
-                    "space_complexity": {{
-                        "overall": "Analysis not available", 
-                        "breakdown": []
-                    }},
-                    "complexity_analysis": {{
-                        "best_case": "Manual analysis required",
-                        "average_case": "Manual analysis required",
-                        "worst_case": "Manual analysis required",
-                        "scalability_notes": "Test with different input sizes"
-                    }}
-                }},
-                "improvement_suggestions": {{
-                    "best_practices": ["Follow {language} coding standards", "Add proper error handling"],
-                    "refactoring": ["Consider code organization improvements"],
-                    "modern_features": ["Use modern {language} features where appropriate"]
-                }},
-                "summary": {{
-                    "error_status": "unknown",
-                    "main_issues": ["Analysis timeout - manual review needed"],
-                    "strengths": ["Code structure exists"],
-                    "priority_fixes": ["Manual code review recommended"],
-                    "overall_score": 6
-                }}
-            }}'''
+            ai_response = FALLBACK_ANALYSIS_TEMPLATE % {'language': language}
         
         # Save analysis to database
         review = CodeReview(
@@ -366,7 +1020,9 @@ IMPORTANT: Focus heavily on debugging and error detection first. Provide detaile
             user_id=current_user.id
         )
         db.session.add(review)
-        db.session.commit()
+        if fresh:
+            add_cached_analysis(cache_key, language, ai_response)
+        commit_review_writes()
         
         processing_time = round(time.time() - start_time, 2)
         
@@ -397,38 +1053,18 @@ def debug_code():
         language = data.get('language', 'python')
         
         # Limit code for faster processing
-        if len(code) > 1500:
-            code = code[:1500] + "... [truncated]"
+        code = truncate_code(code, DEBUG_MAX_CODE_TOKENS, "... [truncated]")
         
-        prompt = f"""Quick debug for {language}:
-
-```{language}
-{code}
-```
-
-Error: {error_message}
-
-JSON (be brief):
-{{
-    "issue_explanation": "Brief issue description",
-    "fixed_code": "Key fixes only",
-    "fix_explanation": "Short explanation",
-    "prevention_tips": ["Top 2 tips"]
-}}"""
+        prompt = DEBUG_PROMPT_TEMPLATE % {
+            'language': language,
+            'code': code,
+            'error': error_message
+        }
         
         try:
-            response = model.generate_content(
-                prompt,
-                request_options={'timeout': 8}
-            )
-            debug_result = response.text if response.text else "Debug analysis unavailable"
+            debug_result = batcher.submit(debug_model, prompt, timeout=8) or "Debug analysis unavailable"
         except:
-            debug_result = f'''{{
-                "issue_explanation": "Unable to analyze due to timeout",
-                "fixed_code": "Manual debugging required",
-                "fix_explanation": "Please check syntax and logic manually",
-                "prevention_tips": ["Use IDE debugging tools", "Add print statements for debugging"]
-            }}'''
+            debug_result = DEBUG_FALLBACK
         
         return jsonify({
             'success': True,
@@ -441,7 +1077,14 @@ JSON (be brief):
 @app.route('/history')
 @login_required
 def history():
-    reviews = CodeReview.query.filter_by(user_id=current_user.id).order_by(CodeReview.created_at.desc()).all()
+    # The list only shows metadata and the code preview, so skip the review_result blob and ORM bookkeeping
+    reviews = db.session.query(
+        CodeReview.id,
+        CodeReview.title,
+        CodeReview.language,
+        CodeReview.code,
+        CodeReview.created_at
+    ).filter_by(user_id=current_user.id).order_by(CodeReview.created_at.desc()).all()
     return render_template('history.html', reviews=reviews)
 
 @app.route('/api/review/<int:review_id>')
@@ -449,7 +1092,9 @@ def history():
 def get_review(review_id):
     review = CodeReview.query.filter_by(id=review_id, user_id=current_user.id).first()
     if review:
-        return jsonify({
+        expire_stale_review(review)
+        # Review payloads carry several KB of code and analysis JSON; orjson encodes them much faster
+        return Response(orjson.dumps({
             'success': True,
             'review': {
                 'id': review.id,
@@ -457,12 +1102,24 @@ def get_review(review_id):
                 'code': review.code,
                 'language': review.language,
                 'result': review.review_result,
+                'status': review.status,
                 'created_at': review.created_at.isoformat()
             }
+        }), mimetype='application/json')
+    return jsonify({'success': False, 'error': 'Review not found'})
+
+@app.route('/api/review/<int:review_id>/status')
+@login_required
+def get_review_status(review_id):
+    review = CodeReview.query.filter_by(id=review_id, user_id=current_user.id).first()
+    if review:
+        expire_stale_review(review)
+        return jsonify({
+            'success': True,
+            'review_id': review.id,
+            'status': review.status
         })
     return jsonify({'success': False, 'error': 'Review not found'})
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
     app.run(debug=True)
\ No newline at end of file
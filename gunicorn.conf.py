@@ -0,0 +1,13 @@
+# Gunicorn settings, picked up automatically from the working directory
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Threaded workers: a request waiting on Gemini only parks its own thread, the
+# other threads of the worker keep serving pages and API calls
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# A grouped analysis plus its single-snippet retry can take close to a minute
+timeout = 90
@@ -0,0 +1,55 @@
+"""initial schema
+
+Revision ID: 1c8aae09339e
+Revises: 
+Create Date: 2026-10-15 21:37:23.783000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c8aae09339e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tables as they were created by db.create_all() before migrations were introduced.
+    # Databases created that way have them already and only need the later revisions.
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('user'):
+        review_columns = {column['name'] for column in inspector.get_columns('code_review')}
+        if inspector.has_table('code_analysis_cache') or 'status' in review_columns:
+            raise RuntimeError(
+                "Database has unversioned tables from later revisions; mark it with "
+                "`flask db stamp <revision>` for the schema it matches before upgrading"
+            )
+        return
+    op.create_table('user',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('code_review',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('code', sa.Text(), nullable=False),
+    sa.Column('language', sa.String(length=50), nullable=False),
+    sa.Column('review_result', sa.Text(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('code_review')
+    op.drop_table('user')
@@ -0,0 +1,48 @@
+"""review status, analysis cache and indexes
+
+Revision ID: 7f3d2a9c4e15
+Revises: 1c8aae09339e
+Create Date: 2026-10-15 21:52:10.118000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3d2a9c4e15'
+down_revision = '1c8aae09339e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('code_analysis_cache',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('language', sa.String(length=50), nullable=False),
+    sa.Column('result', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    with op.batch_alter_table('code_review', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=False, server_default='done'))
+
+    # The original unnamed UNIQUE constraints are left in place; these named indexes back the lookups
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_user_username'), ['username'], unique=True)
+
+    # Autogenerate cannot compare expression-based indexes, so this one is written by hand
+    op.create_index('ix_review_user_created', 'code_review', ['user_id', sa.text('created_at DESC')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_review_user_created', table_name='code_review')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_username'))
+        batch_op.drop_index(batch_op.f('ix_user_email'))
+
+    with op.batch_alter_table('code_review', schema=None) as batch_op:
+        batch_op.drop_column('status')
+
+    op.drop_table('code_analysis_cache')
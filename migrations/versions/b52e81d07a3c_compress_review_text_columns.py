@@ -0,0 +1,77 @@
+"""compress review text columns
+
+Revision ID: b52e81d07a3c
+Revises: 7f3d2a9c4e15
+Create Date: 2026-10-15 21:58:41.402000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import zstandard
+
+
+# revision identifiers, used by Alembic.
+revision = 'b52e81d07a3c'
+down_revision = '7f3d2a9c4e15'
+branch_labels = None
+depends_on = None
+
+
+def _recreate_review_index():
+    # SQLite's batch rebuild copies the index from reflection, which drops the DESC ordering
+    op.drop_index('ix_review_user_created', table_name='code_review')
+    op.create_index('ix_review_user_created', 'code_review', ['user_id', sa.text('created_at DESC')], unique=False)
+
+
+def upgrade():
+    # Existing values are kept as plain UTF-8; CompressedText reads them as-is and
+    # compresses each row the next time it is written
+    with op.batch_alter_table('code_review', schema=None) as batch_op:
+        batch_op.alter_column('code',
+               existing_type=sa.Text(),
+               type_=sa.LargeBinary(),
+               existing_nullable=False,
+               postgresql_using="convert_to(code, 'UTF8')")
+        batch_op.alter_column('review_result',
+               existing_type=sa.Text(),
+               type_=sa.LargeBinary(),
+               existing_nullable=True,
+               postgresql_using="convert_to(review_result, 'UTF8')")
+
+    _recreate_review_index()
+
+
+def _decode(value):
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value[:1] == b'\x01':
+        return zstandard.decompress(value[1:]).decode('utf-8')
+    if value[:1] == b'\x00':
+        return value[1:].decode('utf-8')
+    return value.decode('utf-8')
+
+
+def downgrade():
+    connection = op.get_bind()
+    rows = connection.execute(sa.text('SELECT id, code, review_result FROM code_review')).all()
+
+    with op.batch_alter_table('code_review', schema=None) as batch_op:
+        batch_op.alter_column('code',
+               existing_type=sa.LargeBinary(),
+               type_=sa.Text(),
+               existing_nullable=False,
+               postgresql_using="encode(code, 'escape')")
+        batch_op.alter_column('review_result',
+               existing_type=sa.LargeBinary(),
+               type_=sa.Text(),
+               existing_nullable=True,
+               postgresql_using="encode(review_result, 'escape')")
+
+    _recreate_review_index()
+
+    for row in rows:
+        connection.execute(
+            sa.text('UPDATE code_review SET code = :code, review_result = :review_result WHERE id = :id'),
+            {'id': row.id, 'code': _decode(row.code), 'review_result': _decode(row.review_result)}
+        )
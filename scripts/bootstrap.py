@@ -0,0 +1,19 @@
+"""Create the database tables directly from the models for local development.
+
+Deployed databases should be managed with ``flask db upgrade`` instead.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import stamp
+
+from app import app, db
+
+if __name__ == '__main__':
+    with app.app_context():
+        db.create_all()
+        # Mark the fresh schema as current so later `flask db upgrade` runs only new migrations
+        stamp()
+    print('Database tables created.')
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway database before it is imported
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ['FLASK_INIT_DB'] = '1'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import event
+
+from app import app as flask_app, db, limiter
+
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    limiter.enabled = False
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def logged_in_client(client):
+    client.post('/register', json={'username': 'alice', 'email': 'alice@example.com', 'password': 'secret'})
+    client.post('/login', json={'username': 'alice', 'password': 'secret'})
+    return client
+
+
+@pytest.fixture
+def count_queries(app):
+    """Return a list that collects every SQL statement issued while the test runs."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', record)
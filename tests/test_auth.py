@@ -0,0 +1,115 @@
+import importlib.util
+
+import pytest
+from argon2 import PasswordHasher
+from werkzeug.security import generate_password_hash
+
+import app as app_module
+from app import User, db, limiter, password_hasher, rate_limited
+
+
+def login(client, ip, username, password='wrong'):
+    return client.post(
+        '/login',
+        json={'username': username, 'password': password},
+        headers={'X-Forwarded-For': ip}
+    )
+
+
+@pytest.mark.parametrize('payload', [{'username': 'nobody'}, {'username': 'nobody', 'password': None},
+                                     {'username': 'nobody', 'password': 123}])
+def test_login_without_a_password_string_is_rejected(client, payload):
+    response = client.post('/login', json=payload)
+
+    assert response.status_code == 200
+    assert response.get_json() == {'success': False, 'message': 'Invalid credentials'}
+
+
+def test_login_limit_is_counted_per_forwarded_client(client, monkeypatch):
+    monkeypatch.setattr(limiter, 'enabled', True)
+    limiter.reset()
+
+    for attempt in range(10):
+        assert login(client, '203.0.113.1', f'user{attempt}').status_code == 200
+    blocked = login(client, '203.0.113.1', 'user10')
+    other_client = login(client, '203.0.113.2', 'user10')
+
+    assert blocked.status_code == 429
+    assert blocked.get_json()['message'] == 'Too many login attempts, please try again later'
+    assert other_client.status_code == 200
+    limiter.reset()
+
+
+def test_rate_limit_message_outside_login_is_generic(app):
+    with app.test_request_context('/api/history'):
+        response, status = rate_limited(None)
+
+    assert status == 429
+    assert response.get_json()['message'] == 'Too many requests, please try again later'
+
+
+def add_user(app, password_hash):
+    with app.app_context():
+        db.session.add(User(username='legacy', email='legacy@example.com', password_hash=password_hash))
+        db.session.commit()
+
+
+def stored_hash(app):
+    with app.app_context():
+        return User.query.filter_by(username='legacy').one().password_hash
+
+
+def test_legacy_hash_is_upgraded_to_argon2id_on_login(app, client):
+    add_user(app, generate_password_hash('secret', method='pbkdf2:sha256'))
+
+    response = login(client, '203.0.113.1', 'legacy', 'secret')
+
+    assert response.get_json()['success'] is True
+    new_hash = stored_hash(app)
+    assert new_hash.startswith('$argon2id$')
+    assert password_hasher.verify(new_hash, 'secret')
+
+
+def test_wrong_password_leaves_the_legacy_hash_alone(app, client):
+    legacy_hash = generate_password_hash('secret', method='pbkdf2:sha256')
+    add_user(app, legacy_hash)
+
+    response = login(client, '203.0.113.1', 'legacy', 'wrong')
+
+    assert response.get_json()['success'] is False
+    assert stored_hash(app) == legacy_hash
+
+
+def test_outdated_argon2_parameters_are_rehashed_on_login(app, client):
+    weak_hash = PasswordHasher(time_cost=1, memory_cost=8 * 1024, parallelism=1).hash('secret')
+    add_user(app, weak_hash)
+
+    response = login(client, '203.0.113.1', 'legacy', 'secret')
+
+    assert response.get_json()['success'] is True
+    new_hash = stored_hash(app)
+    assert new_hash != weak_hash
+    assert not password_hasher.check_needs_rehash(new_hash)
+
+
+def test_current_argon2_hash_is_kept_on_login(app, client):
+    current_hash = password_hasher.hash('secret')
+    add_user(app, current_hash)
+
+    assert login(client, '203.0.113.1', 'legacy', 'secret').get_json()['success'] is True
+    assert stored_hash(app) == current_hash
+
+
+def test_login_keeps_working_when_the_rate_limit_store_is_down(monkeypatch):
+    # A fresh copy of the app whose limiter points at a Redis that isn't there
+    monkeypatch.setenv('REDIS_URL', 'redis://127.0.0.1:1/0')
+    spec = importlib.util.spec_from_file_location('app_without_redis', app_module.__file__)
+    unreachable = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(unreachable)
+    unreachable.app.config['TESTING'] = True
+    client = unreachable.app.test_client()
+
+    responses = [login(client, '203.0.113.1', f'user{attempt}') for attempt in range(11)]
+
+    assert [response.status_code for response in responses[:10]] == [200] * 10
+    assert responses[10].status_code == 429
@@ -0,0 +1,223 @@
+import concurrent.futures
+import re
+import threading
+import time
+
+import orjson
+import pytest
+
+import app as app_module
+from app import BatchedAnalyzer
+
+SNIPPET_CODE = re.compile(r'```\w*\n(.*?)\n```', re.DOTALL)
+
+
+class FakeBatcher:
+    """Stands in for AnalysisBatcher and answers prompts without calling Gemini.
+
+    Answers are held back while ``release`` is cleared, which keeps the first
+    analysis of a user in flight.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.prompts = []
+        self.release = threading.Event()
+        self.release.set()
+        self._lock = threading.Lock()
+
+    def schedule(self, gen_model, prompt, timeout):
+        with self._lock:
+            self.prompts.append(prompt)
+        future = concurrent.futures.Future()
+
+        def answer():
+            self.release.wait(timeout=5)
+            try:
+                future.set_result(self.respond(prompt))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=answer, daemon=True).start()
+        return future
+
+    def wait_for_prompts(self, count):
+        deadline = time.monotonic() + 5
+        while len(self.prompts) < count and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert len(self.prompts) >= count
+
+
+def echo_codes(prompt):
+    codes = SNIPPET_CODE.findall(prompt)
+    if '### Snippet' in prompt:
+        return '```json\n' + orjson.dumps([{'code': code} for code in codes]).decode() + '\n```'
+    return orjson.dumps({'single': codes[0]}).decode()
+
+
+def start_submissions(analyzer, submissions):
+    """Submit each (user_id, code) on its own thread; return the threads and a results list."""
+    results = [None] * len(submissions)
+
+    def run(index, user_id, code):
+        try:
+            results[index] = orjson.loads(analyzer.submit(user_id, code, 'python', '', timeout=2))
+        except Exception as e:
+            results[index] = e
+
+    threads = [
+        threading.Thread(target=run, args=(index, user_id, code))
+        for index, (user_id, code) in enumerate(submissions)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def join(threads):
+    for thread in threads:
+        thread.join(timeout=10)
+
+
+@pytest.fixture
+def fake_batcher(monkeypatch):
+    def install(respond=echo_codes):
+        fake = FakeBatcher(respond)
+        monkeypatch.setattr(app_module, 'batcher', fake)
+        return fake
+    return install
+
+
+def hold_first_analysis(fake, analyzer, user_id=1):
+    """Put one analysis for ``user_id`` in flight and return its thread and results."""
+    fake.release.clear()
+    threads, results = start_submissions(analyzer, [(user_id, 'first')])
+    fake.wait_for_prompts(1)
+    return threads, results
+
+
+def test_lone_snippet_is_sent_immediately_with_the_single_prompt(fake_batcher):
+    fake = fake_batcher()
+    analyzer = BatchedAnalyzer(max_snippets=4, max_wait=5)
+
+    started = time.monotonic()
+    result = orjson.loads(analyzer.submit(1, 'alone', 'python', '', timeout=2))
+
+    assert time.monotonic() - started < 1
+    assert result == {'single': 'alone'}
+    assert '### Snippet' not in fake.prompts[0]
+    assert analyzer._timers == {}
+
+
+def test_snippets_arriving_while_one_is_in_flight_share_a_prompt(fake_batcher):
+    fake = fake_batcher()
+    analyzer = BatchedAnalyzer(max_snippets=2, max_wait=5)
+
+    first_threads, first_results = hold_first_analysis(fake, analyzer)
+    threads, results = start_submissions(analyzer, [(1, 'second'), (1, 'third')])
+    fake.wait_for_prompts(2)
+    fake.release.set()
+    join(first_threads + threads)
+
+    assert first_results == [{'single': 'first'}]
+    assert fake.prompts[1].count('### Snippet') == 2
+    assert sorted(result['code'] for result in results) == ['second', 'third']
+
+
+def test_each_request_gets_the_analysis_of_its_own_snippet(fake_batcher):
+    fake = fake_batcher()
+    analyzer = BatchedAnalyzer(max_snippets=3, max_wait=5)
+
+    first_threads, _ = hold_first_analysis(fake, analyzer)
+    submissions = [(1, 'a'), (1, 'b'), (1, 'c')]
+    threads, results = start_submissions(analyzer, submissions)
+    fake.wait_for_prompts(2)
+    fake.release.set()
+    join(first_threads + threads)
+
+    for (_, code), result in zip(submissions, results):
+        assert result['code'] == code
+
+
+def test_snippets_of_different_users_never_share_a_prompt(fake_batcher):
+    fake = fake_batcher()
+    analyzer = BatchedAnalyzer(max_snippets=4, max_wait=0.05)
+
+    first_threads, _ = hold_first_analysis(fake, analyzer)
+    threads, results = start_submissions(analyzer, [(2, 'bob_a'), (1, 'alice_a'), (1, 'alice_b')])
+    fake.wait_for_prompts(3)
+    fake.release.set()
+    join(first_threads + threads)
+
+    # Bob has nothing in flight, so his snippet isn't held behind Alice's
+    assert 'bob_a' in fake.prompts[1]
+    for prompt in fake.prompts:
+        owners = {code.split('_')[0] for code in SNIPPET_CODE.findall(prompt)}
+        assert len(owners) == 1
+
+
+def test_held_snippet_is_flushed_by_the_timer(fake_batcher):
+    fake = fake_batcher()
+    analyzer = BatchedAnalyzer(max_snippets=4, max_wait=0.01)
+
+    first_threads, _ = hold_first_analysis(fake, analyzer)
+    threads, results = start_submissions(analyzer, [(1, 'held')])
+    fake.wait_for_prompts(2)
+    fake.release.set()
+    join(first_threads + threads)
+
+    assert results == [{'single': 'held'}]
+    assert '### Snippet' not in fake.prompts[1]
+
+
+def test_mismatched_array_is_retried_per_snippet(fake_batcher):
+    def respond(prompt):
+        if '### Snippet' in prompt:
+            return '[{"only": "one"}]'
+        return echo_codes(prompt)
+
+    fake = fake_batcher(respond)
+    analyzer = BatchedAnalyzer(max_snippets=2, max_wait=5)
+
+    first_threads, _ = hold_first_analysis(fake, analyzer)
+    threads, results = start_submissions(analyzer, [(1, 'x'), (1, 'y')])
+    fake.wait_for_prompts(2)
+    fake.release.set()
+    join(first_threads + threads)
+
+    assert sorted(result['single'] for result in results) == ['x', 'y']
+    assert len(fake.prompts) == 4
+
+
+def test_api_error_reaches_every_waiting_request(fake_batcher):
+    def respond(prompt):
+        raise RuntimeError('quota exceeded')
+
+    fake = fake_batcher(respond)
+    analyzer = BatchedAnalyzer(max_snippets=2, max_wait=5)
+
+    first_threads, first_results = hold_first_analysis(fake, analyzer)
+    threads, results = start_submissions(analyzer, [(1, 'x'), (1, 'y')])
+    fake.wait_for_prompts(2)
+    fake.release.set()
+    join(first_threads + threads)
+
+    assert [str(error) for error in first_results + results] == ['quota exceeded'] * 3
+
+
+def test_in_flight_bookkeeping_is_cleared_once_answers_land(fake_batcher):
+    fake = fake_batcher()
+    analyzer = BatchedAnalyzer(max_snippets=2, max_wait=5)
+
+    first_threads, _ = hold_first_analysis(fake, analyzer)
+    threads, _ = start_submissions(analyzer, [(1, 'x'), (1, 'y')])
+    fake.wait_for_prompts(2)
+    fake.release.set()
+    join(first_threads + threads)
+
+    # The bookkeeping callback may run just after the waiting request wakes up
+    deadline = time.monotonic() + 5
+    while analyzer._in_flight and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert analyzer._in_flight == {}
+    assert analyzer._pending == {}
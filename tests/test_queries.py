@@ -0,0 +1,37 @@
+from app import CodeReview, User, db
+
+
+def add_reviews(app, count):
+    with app.app_context():
+        user = User.query.filter_by(username='alice').one()
+        for index in range(count):
+            db.session.add(CodeReview(
+                title=f'Review {index}',
+                code=f'print({index})',
+                language='python',
+                review_result='{}',
+                user_id=user.id
+            ))
+        db.session.commit()
+
+
+def test_history_issues_at_most_two_queries(app, logged_in_client, count_queries):
+    add_reviews(app, 8)
+    count_queries.clear()
+
+    response = logged_in_client.get('/history')
+
+    assert response.status_code == 200
+    assert b'Review 7' in response.data
+    # Session user lookup plus the review list, regardless of how many reviews there are
+    assert len(count_queries) <= 2
+
+
+def test_dashboard_issues_at_most_two_queries(app, logged_in_client, count_queries):
+    add_reviews(app, 8)
+    count_queries.clear()
+
+    response = logged_in_client.get('/')
+
+    assert response.status_code == 200
+    assert len(count_queries) <= 2
@@ -0,0 +1,151 @@
+import datetime
+import types
+
+import orjson
+import pytest
+
+from app import CodeAnalysisCache, CodeReview, User, add_cached_analysis, db
+
+
+def add_pending_review(app, age):
+    with app.app_context():
+        user = User.query.filter_by(username='alice').one()
+        review = CodeReview(
+            title='Queued',
+            code='print(1)',
+            language='python',
+            status='pending',
+            user_id=user.id,
+            created_at=datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - age
+        )
+        db.session.add(review)
+        db.session.commit()
+        return review.id
+
+
+def test_recent_pending_review_stays_pending(app, logged_in_client):
+    review_id = add_pending_review(app, datetime.timedelta(minutes=1))
+
+    status = logged_in_client.get(f'/api/review/{review_id}/status').get_json()
+
+    assert status['status'] == 'pending'
+
+
+def test_stale_pending_review_fails_with_fallback_analysis(app, logged_in_client):
+    review_id = add_pending_review(app, datetime.timedelta(hours=1))
+
+    status = logged_in_client.get(f'/api/review/{review_id}/status').get_json()
+    review = logged_in_client.get(f'/api/review/{review_id}').get_json()['review']
+
+    assert status['status'] == 'failed'
+    assert review['status'] == 'failed'
+    assert orjson.loads(review['result'])['summary']['error_status'] == 'unknown'
+
+
+class FakeAnalyzer:
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    def submit(self, *args, **kwargs):
+        self.calls += 1
+        return self.response
+
+
+def analyze(client, code):
+    return client.post('/api/analyze-code', json={'code': code, 'language': 'python'}).get_json()
+
+
+def test_valid_analysis_is_cached(logged_in_client, monkeypatch):
+    fake = FakeAnalyzer('```json\n{"summary": {}}\n```')
+    monkeypatch.setattr('app.analyzer', fake)
+
+    first = analyze(logged_in_client, 'print(1)')
+    second = analyze(logged_in_client, 'print(1)')
+
+    assert fake.calls == 1
+    assert second['analysis'] == first['analysis']
+
+
+def test_truncated_analysis_is_not_cached(app, logged_in_client, monkeypatch):
+    fake = FakeAnalyzer('{"summary": {"error_sta')
+    monkeypatch.setattr('app.analyzer', fake)
+
+    analyze(logged_in_client, 'print(1)')
+    analyze(logged_in_client, 'print(1)')
+
+    assert fake.calls == 2
+    with app.app_context():
+        assert CodeAnalysisCache.query.count() == 0
+
+
+def test_review_fails_when_the_broker_is_unreachable(app, logged_in_client, monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise ConnectionError('broker down')
+
+    monkeypatch.setattr('app.celery_broker_url', 'redis://broker:6379/0')
+    monkeypatch.setattr('app.run_analysis.delay', unreachable)
+
+    result = analyze(logged_in_client, 'print(1)')
+
+    assert orjson.loads(result['analysis'])['summary']['error_status'] == 'unknown'
+    with app.app_context():
+        assert db.session.get(CodeReview, result['review_id']).status == 'failed'
+
+
+class FakeStreamingModel:
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        async def chunks():
+            for text in ('{"summary": ', '{}}'):
+                yield types.SimpleNamespace(text=text, parts=[text])
+        return chunks()
+
+
+def test_streamed_analysis_is_generated_on_the_event_loop(app, logged_in_client, monkeypatch):
+    monkeypatch.setattr('app.analyze_model', FakeStreamingModel())
+
+    response = logged_in_client.post('/api/analyze-code', json={'code': 'print(1)', 'stream': True})
+    frames = [orjson.loads(line) for line in response.data.splitlines()]
+
+    assert [frame['type'] for frame in frames] == ['chunk', 'chunk', 'done']
+    with app.app_context():
+        review = db.session.get(CodeReview, frames[-1]['review_id'])
+        assert review.review_result == '{"summary": {}}'
+
+
+def test_deferred_analysis_without_a_broker_is_rejected(logged_in_client, monkeypatch):
+    fake = FakeAnalyzer('{"summary": {}}')
+    monkeypatch.setattr('app.analyzer', fake)
+
+    response = logged_in_client.post('/api/analyze-code', json={'code': 'print(1)', 'defer': True})
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert fake.calls == 0
+
+
+def test_deferred_analysis_is_queued_on_the_broker(app, logged_in_client, monkeypatch):
+    queued = []
+    monkeypatch.setattr('app.celery_broker_url', 'redis://broker:6379/0')
+    monkeypatch.setattr('app.run_analysis.delay', lambda *args: queued.append(args))
+
+    result = logged_in_client.post('/api/analyze-code', json={'code': 'print(1)', 'defer': True}).get_json()
+
+    assert result['status'] == 'pending'
+    assert queued[0][0] == result['review_id']
+
+
+@pytest.mark.parametrize('dialect', ['sqlite', 'mysql'])
+def test_duplicate_cache_row_keeps_the_review(app, logged_in_client, monkeypatch, dialect):
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, 'name', dialect)
+        user = User.query.filter_by(username='alice').one()
+        add_cached_analysis('key', 'python', '{"first": true}')
+        db.session.commit()
+
+        db.session.add(CodeReview(title='Kept', code='print(1)', language='python', user_id=user.id))
+        add_cached_analysis('key', 'python', '{"second": true}')
+        db.session.commit()
+
+        assert CodeReview.query.filter_by(title='Kept').count() == 1
+        assert db.session.get(CodeAnalysisCache, 'key').result == '{"first": true}'
@@ -0,0 +1,95 @@
+import importlib.util
+import os
+
+import pytest
+import zstandard
+
+from app import CodeReview, CompressedText, User, db
+
+MIGRATION = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'migrations', 'versions', 'b52e81d07a3c_compress_review_text_columns.py'
+)
+
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        user = User(username='alice', email='alice@example.com', password_hash='unused')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def stored_code(review_id):
+    return db.session.execute(
+        db.text('SELECT code FROM code_review WHERE id = :id'), {'id': review_id}
+    ).scalar_one()
+
+
+def insert_raw_code(user_id, code):
+    """Write the code column directly, as rows from before the compression migration look."""
+    return db.session.execute(
+        db.text(
+            "INSERT INTO code_review (title, code, language, user_id, status) "
+            "VALUES ('Legacy', :code, 'python', :user_id, 'done') RETURNING id"
+        ),
+        {'code': code, 'user_id': user_id}
+    ).scalar_one()
+
+
+@pytest.mark.parametrize('code, prefix', [
+    ('print(1)', CompressedText.RAW),
+    ('print(1)\n' * 100, CompressedText.ZSTD),
+    ('print("héllo, wörld ✓")', CompressedText.RAW),
+    ('# コメント ✓\n' * 100, CompressedText.ZSTD),
+])
+def test_review_code_round_trips(app, user_id, code, prefix):
+    with app.app_context():
+        review = CodeReview(title='Test', code=code, language='python', user_id=user_id)
+        db.session.add(review)
+        db.session.commit()
+        review_id = review.id
+        db.session.expunge_all()
+
+        assert stored_code(review_id)[:1] == prefix
+        assert db.session.get(CodeReview, review_id).code == code
+
+
+def test_small_values_are_stored_uncompressed_and_large_ones_shrink():
+    small = 'x' * (CompressedText.MIN_COMPRESS_SIZE - 1)
+    large = 'x' * CompressedText.MIN_COMPRESS_SIZE * 10
+    column_type = CompressedText()
+
+    assert column_type.process_bind_param(small, None) == CompressedText.RAW + small.encode()
+    assert len(column_type.process_bind_param(large, None)) < len(large)
+
+
+def test_legacy_text_value_is_read_as_is(app, user_id):
+    with app.app_context():
+        review_id = insert_raw_code(user_id, 'print("legacy ✓")')
+        db.session.commit()
+
+        assert isinstance(stored_code(review_id), str)
+        assert db.session.get(CodeReview, review_id).code == 'print("legacy ✓")'
+
+
+def test_prefixless_bytes_from_convert_to_are_decoded(app, user_id):
+    with app.app_context():
+        review_id = insert_raw_code(user_id, 'print("converted ✓")'.encode('utf-8'))
+        db.session.commit()
+
+        assert db.session.get(CodeReview, review_id).code == 'print("converted ✓")'
+
+
+def test_migration_downgrade_decodes_every_stored_form():
+    spec = importlib.util.spec_from_file_location('compress_migration', MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    text = 'naïve ✓ ' * 50
+
+    assert migration._decode(None) is None
+    assert migration._decode(text) == text
+    assert migration._decode(b'\x00' + text.encode()) == text
+    assert migration._decode(b'\x01' + zstandard.compress(text.encode(), 3)) == text
+    assert migration._decode(text.encode()) == text
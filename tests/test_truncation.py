@@ -0,0 +1,51 @@
+import types
+
+import app as app_module
+from app import truncate_code
+
+
+class FakeTokenizer:
+    """Count one token per character of the leading half and one per word after it."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def count_tokens(self, code, request_options=None):
+        self.calls += 1
+        return types.SimpleNamespace(total_tokens=min(len(code), 500) + code[500:].count(' '))
+
+
+def test_truncated_code_fits_the_budget_when_density_is_uneven(monkeypatch):
+    tokenizer = FakeTokenizer()
+    monkeypatch.setattr(app_module, 'analyze_model', tokenizer)
+    code = 'x' * 500 + ' word' * 500
+
+    truncated = truncate_code(code, 400, '!')
+
+    assert truncated.endswith('!')
+    assert tokenizer.calls == 2
+    assert tokenizer.count_tokens(truncated[:-1]).total_tokens <= 400
+
+
+def test_cache_hit_skips_token_counting(logged_in_client, monkeypatch):
+    tokenizer = FakeTokenizer()
+    monkeypatch.setattr(app_module, 'analyze_model', tokenizer)
+    monkeypatch.setattr(app_module.analyzer, 'submit', lambda *args, **kwargs: '{"summary": {}}')
+    code = 'x = 1\n' * 200
+
+    logged_in_client.post('/api/analyze-code', json={'code': code})
+    calls = tokenizer.calls
+    logged_in_client.post('/api/analyze-code', json={'code': code})
+
+    assert calls > 0
+    assert tokenizer.calls == calls
+
+
+def test_recount_accepts_the_proportional_cut_when_it_fits(monkeypatch):
+    tokenizer = FakeTokenizer()
+    tokenizer.count_tokens = lambda code, request_options=None: types.SimpleNamespace(total_tokens=len(code) // 4)
+    monkeypatch.setattr(app_module, 'analyze_model', tokenizer)
+
+    truncated = truncate_code('x' * 4000, 400, '!')
+
+    assert truncated == 'x' * 1440 + '!'